@@ -6,11 +6,15 @@ Accepts JSON payload from Google Apps Script and returns team assignments.
 """
 
 import functions_framework
-from flask import Request
+from flask import Request, Response
 import pandas as pd
-from collections import defaultdict
+import numpy as np
+import numba
+from collections import Counter, defaultdict
+from itertools import islice
 import math
 import json
+import orjson
 import logging
 
 # --- Team Allocation Rules ---
@@ -18,209 +22,376 @@ MIN_TEAM_SIZE = 7
 MAX_TEAM_SIZE = 9
 IDEAL_TEAM_SIZE = 8
 
+# --- Pod Codes ---
+# Group compositions are count arrays indexed by these codes; any other pod value is counted as OTHER_POD
+BLUE_POD, GREEN_POD, PINK_POD, RED_POD, OTHER_POD = range(5)
+POD_CODES = {'Blue': BLUE_POD, 'Green': GREEN_POD, 'Pink': PINK_POD, 'Red': RED_POD}
+
 # --- Coach Pairing Configuration ---
 COACH_PAIRINGS = [
     # ('Coach A', 'Coach B'),
 ]
 
+# --- Player Data Defaults ---
+REQUIRED_COLUMNS = {
+    'key': '', 'available': 0, 'istentpole': False,
+    'pairedwith': '', 'tier': 2, 'coach': '', 'pod': 'Unknown'
+}
+
+# Rosters smaller than this are processed as plain lists of dicts; below it pandas'
+# fixed per-operation overhead costs more than the allocation itself
+SMALL_ROSTER_SIZE = 200
+
 
 def preprocess_data(df):
     """Cleans and prepares player data, ensuring all required columns exist."""
     df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
-    required_cols = {
-        'key': '', 'available': 0, 'istentpole': False,
-        'pairedwith': '', 'tier': 2, 'coach': '', 'pod': 'Unknown'
-    }
-    for col, default_val in required_cols.items():
+    for col, default_val in REQUIRED_COLUMNS.items():
         if col not in df.columns:
             logging.warning(f"Column '{col}' not found. Creating it with default values.")
             df[col] = default_val
 
-    df.fillna({
-        'key': '', 'available': 0, 'istentpole': False,
-        'pairedwith': '', 'tier': 2, 'coach': '', 'pod': 'Unknown'
-    }, inplace=True)
+    df.fillna(REQUIRED_COLUMNS, inplace=True)
 
     df['key'] = df['key'].astype(str).str.strip()
-    df = df[df['key'] != ''].copy()
     df['available'] = pd.to_numeric(df['available'], errors='coerce').fillna(0).astype(int)
-    available_players_df = df[df['available'] == 1].copy()
-
-    available_players_df['istentpole'] = available_players_df['istentpole'].apply(
-        lambda x: str(x).strip().upper() == 'TRUE'
-    )
-    available_players_df['pairedwith'] = available_players_df['pairedwith'].astype(str).str.strip()
-    available_players_df['coach'] = available_players_df['coach'].astype(str).str.strip()
-    available_players_df['tier'] = pd.to_numeric(available_players_df['tier'], errors='coerce').fillna(2).astype(int)
-    available_players_df['pod'] = available_players_df['pod'].astype(str).str.strip()
+    df = df[df['key'] != '']
+
+    # The available players are built from just the columns the allocator reads, rather than
+    # copying the whole roster frame and overwriting columns on the copy
+    is_available = df['available'] == 1
+    pod = df.loc[is_available, 'pod'].astype(str).str.strip()
+    available_players_df = pd.DataFrame({
+        'key': df.loc[is_available, 'key'],
+        'istentpole': df.loc[is_available, 'istentpole'].astype(str).str.strip().str.upper().eq('TRUE'),
+        'pairedwith': df.loc[is_available, 'pairedwith'].astype(str).str.strip(),
+        'tier': pd.to_numeric(df.loc[is_available, 'tier'], errors='coerce').fillna(2).astype(int),
+        'coach': df.loc[is_available, 'coach'].astype(str).str.strip(),
+        'pod': pod,
+        'pod_code': pod.map(POD_CODES).fillna(OTHER_POD).astype(np.int32)
+    })
 
     return df, available_players_df
 
 
-def create_allocation_groups(df):
-    """Identifies social/coach pairings and creates allocation groups with aggregated attributes."""
-    parent = {key: key for key in df['key']}
-    
-    def find(key):
-        if parent[key] == key: 
-            return key
-        parent[key] = find(parent[key])
-        return parent[key]
-    
-    def union(key1, key2):
-        root1, root2 = find(key1), find(key2)
-        if root1 != root2: 
+def _to_int(value, default):
+    """Single-value equivalent of pd.to_numeric(errors='coerce').fillna(default).astype(int)."""
+    if isinstance(value, str):
+        # float() also takes digit separators and non-ASCII digits, which pandas rejects
+        if '_' in value or not value.isascii():
+            return default
+        try:
+            value = float(value)
+        except ValueError:
+            return default
+    if not isinstance(value, (int, float)) or value != value:
+        return default
+    return int(value)
+
+
+_MISSING = object()
+_INT64_MIN, _INT64_MAX, _UINT64_MAX = -2**63, 2**63 - 1, 2**64 - 1
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+def _float_columns(records):
+    """Required columns that pd.DataFrame(records) would infer as float64.
+
+    Mirrors pandas' object-dtype inference: a column of ints/floats (no bools) becomes float64 when it
+    also holds a float or a missing value, so e.g. 101 stringifies as '101.0'. Until an explicit None
+    has been seen, an int outside int64/uint64, or a mix of negative and uint64-only ints, keeps the
+    column object instead.
+    """
+    float_columns = set()
+    for col in REQUIRED_COLUMNS:
+        seen_none = seen_float = seen_uint = seen_sint = False
+        for record in records:
+            value = record.get(col, _MISSING)
+            if value is None:
+                seen_none = True
+            elif value is _MISSING or isinstance(value, float):
+                seen_float = True
+            elif isinstance(value, bool) or not isinstance(value, int):
+                break
+            elif not seen_none:
+                seen_uint = seen_uint or value > _INT64_MAX
+                seen_sint = seen_sint or value < 0
+                if (seen_uint and seen_sint) or value > _UINT64_MAX or value < _INT64_MIN:
+                    break
+        else:
+            if seen_none or seen_float:
+                float_columns.add(col)
+    return float_columns
+
+
+def preprocess_records(players):
+    """List-of-dicts counterpart of preprocess_data, used for small rosters."""
+    records = [{str(col).strip().lower().replace(' ', '_'): value for col, value in player.items()} for player in players]
+    columns = set().union(*records)
+    for col in REQUIRED_COLUMNS:
+        if col not in columns:
+            logging.warning(f"Column '{col}' not found. Creating it with default values.")
+
+    # Reproduce pandas' column dtype inference so both backends stringify values identically
+    float_columns = _float_columns(records)
+
+    all_players, available_players = [], []
+    for record in records:
+        for col, default_val in REQUIRED_COLUMNS.items():
+            value = record.get(col)
+            if _is_missing(value):
+                record[col] = default_val
+            elif col in float_columns:
+                record[col] = float(value)
+
+        record['key'] = str(record['key']).strip()
+        if record['key'] == '':
+            continue
+        record['available'] = _to_int(record['available'], 0)
+        all_players.append(record)
+
+        if record['available'] == 1:
+            pod = str(record['pod']).strip()
+            available_players.append({
+                'key': record['key'],
+                'istentpole': str(record['istentpole']).strip().upper() == 'TRUE',
+                'pairedwith': str(record['pairedwith']).strip(),
+                'tier': _to_int(record['tier'], 2),
+                'coach': str(record['coach']).strip(),
+                'pod': pod,
+                'pod_code': POD_CODES.get(pod, OTHER_POD)
+            })
+
+    return all_players, available_players
+
+
+@numba.njit
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+@numba.njit
+def _run_dsu(parent, size, pairs_a, pairs_b):
+    """Unions each (pairs_a[i], pairs_b[i]) pair (path halving, union by size) and returns every node's root."""
+    for i in range(pairs_a.shape[0]):
+        root1, root2 = _find(parent, pairs_a[i]), _find(parent, pairs_b[i])
+        if root1 != root2:
+            if size[root1] < size[root2]:
+                root1, root2 = root2, root1
             parent[root2] = root1
+            size[root1] += size[root2]
+    for x in range(parent.shape[0]):
+        parent[x] = _find(parent, x)
+    return parent
 
-    key_map = {name.lower(): key for name, key in zip(df['key'], df['key'])}
-    for _, row in df.iterrows():
-        if row['pairedwith']:
-            partner_key = key_map.get(str(row['pairedwith']).lower())
-            if partner_key and partner_key in parent:
-                union(row['key'], partner_key)
 
-    coach_to_kids = defaultdict(list)
-    for _, row in df.iterrows():
-        if row['coach']:
-            coach_to_kids[row['coach']].append(row['key'])
+# Compile the union-find kernel at import time. This does not remove the JIT cost: every new
+# instance still pays it (plus the numba import) while starting, and on a scale-from-zero
+# instance that start-up lands inside the first request. It only keeps the compile out of
+# the allocation code path for requests served by an already-warm instance.
+_run_dsu(np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64),
+         np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+
+
+def _group_players(keys, partners, pods, pod_codes, tentpole_keys, coach_to_kids):
+    """Unions paired players and coach pairings, then builds the allocation groups.
+
+    `partners` holds each player's lower-cased pairedwith value, matched case-insensitively against `keys`.
+    """
+    index = {key: i for i, key in enumerate(keys)}
+    pairs_a, pairs_b = [], []
+
+    key_map = dict(zip(map(str.lower, keys), keys))
+    for key, partner in zip(keys, partners):
+        if partner:
+            partner_key = key_map.get(partner)
+            if partner_key:
+                pairs_a.append(index[key])
+                pairs_b.append(index[partner_key])
+
     for coach1, coach2 in COACH_PAIRINGS:
         kids1, kids2 = coach_to_kids.get(coach1), coach_to_kids.get(coach2)
         if kids1 and kids2:
             anchor = kids1[0]
             for kid in kids1[1:] + kids2:
-                union(anchor, kid)
+                pairs_a.append(index[anchor])
+                pairs_b.append(index[kid])
 
+    node_roots = _run_dsu(np.arange(len(keys), dtype=np.int64), np.ones(len(keys), dtype=np.int64),
+                          np.array(pairs_a, dtype=np.int64), np.array(pairs_b, dtype=np.int64))
+    roots = [node_roots[index[key]] for key in keys]
     social_groups = defaultdict(list)
-    for key in df['key']:
-        social_groups[find(key)].append(key)
+    group_pods = defaultdict(list)
+    for key, root, pod in zip(keys, roots, pods):
+        social_groups[root].append(key)
+        group_pods[root].append(pod)
+
+    # Per-group pod counts indexed by pod code, filled in a single pass. The primary pod
+    # (used for initial placement) is the most common pod, ties going to the first alphabetically;
+    # codes are alphabetical, so argmax gives it directly unless the group has OTHER_POD labels
+    group_ids = {root: i for i, root in enumerate(social_groups)}
+    compositions = np.zeros((len(social_groups), OTHER_POD + 1), dtype=np.int32)
+    np.add.at(compositions, ([group_ids[root] for root in roots], pod_codes), 1)
+    primary_pods = compositions.argmax(axis=1)
 
-    player_info = df.set_index('key')
     groups = []
-    for player_keys in social_groups.values():
-        group_pods = player_info.loc[player_keys]['pod']
-        composition = group_pods.value_counts().to_dict()
-
-        # Determine the primary color of the group for initial placement
-        primary_pod = group_pods.mode()[0] if not group_pods.empty else 'Unknown'
-
+    for root, player_keys in social_groups.items():
+        composition = compositions[group_ids[root]]
+        primary_pod = primary_pods[group_ids[root]]
+        if composition[OTHER_POD]:
+            # OTHER_POD pools distinct labels, so rank the actual labels instead
+            label_counts = Counter(group_pods[root])
+            primary_pod = POD_CODES.get(min(label_counts, key=lambda pod: (-label_counts[pod], pod)), OTHER_POD)
         groups.append({
             'keys': player_keys,
             'size': len(player_keys),
-            'is_tentpole_group': any(player_info.loc[key]['istentpole'] for key in player_keys),
+            'is_tentpole_group': not tentpole_keys.isdisjoint(player_keys),
             'composition': composition,
             'primary_pod': primary_pod,
-            'has_green': 'Green' in composition
+            'has_green': composition[GREEN_POD] > 0
         })
     return groups
 
 
-def allocate_teams_stratified(groups, df_available):
+def create_allocation_groups(df):
+    """Identifies social/coach pairings and creates allocation groups with aggregated attributes."""
+    coach_to_kids = df[df['coach'] != ''].groupby('coach')['key'].apply(list).to_dict()
+    return _group_players(
+        df['key'].tolist(), df['pairedwith'].str.lower().tolist(), df['pod'].tolist(), df['pod_code'].to_numpy(),
+        set(df.loc[df['istentpole'], 'key']), coach_to_kids
+    )
+
+
+def create_allocation_groups_from_records(players):
+    """List-of-dicts counterpart of create_allocation_groups, used for small rosters."""
+    coach_to_kids = defaultdict(list)
+    for player in players:
+        if player['coach']:
+            coach_to_kids[player['coach']].append(player['key'])
+    return _group_players(
+        [p['key'] for p in players], [p['pairedwith'].lower() for p in players],
+        [p['pod'] for p in players], [p['pod_code'] for p in players],
+        {p['key'] for p in players if p['istentpole']}, coach_to_kids
+    )
+
+
+def allocate_teams_stratified(groups):
     """Performs the new, constraint-aware preferential assignment of groups to teams."""
-    assignments = {}
+    team_assignments = {}
 
     # --- Phase 1 & 2: Foundation and Depth ---
     # Determine team structure
-    red_players = sum(g['composition'].get('Red', 0) for g in groups)
-    blue_players = sum(g['composition'].get('Blue', 0) for g in groups)
+    red_players = sum(g['composition'][RED_POD] for g in groups)
+    blue_players = sum(g['composition'][BLUE_POD] for g in groups)
     num_red_teams = math.ceil(red_players / IDEAL_TEAM_SIZE) if red_players > 0 else 0
     num_blue_teams = math.ceil(blue_players / IDEAL_TEAM_SIZE) if blue_players > 0 else 0
 
-    teams = {}
-    for i in range(num_red_teams): 
-        teams[f"Red Team {i+1}"] = {'color': 'Red'}
-    for i in range(num_blue_teams): 
-        teams[f"Blue Team {i+1}"] = {'color': 'Blue'}
-
-    # Initialize team stats
-    for name in teams:
-        teams[name].update({'size': 0, 'red_count': 0, 'green_count': 0, 'pink_count': 0, 'groups': []})
+    # Team stats are kept as parallel arrays indexed by team id
+    team_names = [f"Red Team {i+1}" for i in range(num_red_teams)] + \
+                 [f"Blue Team {i+1}" for i in range(num_blue_teams)]
+    team_color = np.array([RED_POD] * num_red_teams + [BLUE_POD] * num_blue_teams, dtype=np.int32)
+    team_size = np.zeros(len(team_names), dtype=np.int32)
+    team_red = np.zeros(len(team_names), dtype=np.int32)
+    team_green = np.zeros(len(team_names), dtype=np.int32)
+    team_pink = np.zeros(len(team_names), dtype=np.int32)
 
     # Assign core Red/Blue groups
     unassigned_groups = []
-    red_blue_groups = sorted([g for g in groups if g['primary_pod'] in ['Red', 'Blue']], key=lambda x: -x['size'])
+    group_pods = np.array([g['primary_pod'] for g in groups], dtype=np.int32)
+    group_sizes = np.array([g['size'] for g in groups], dtype=np.int32)
+    is_red_blue = (group_pods == RED_POD) | (group_pods == BLUE_POD)
+    red_blue_ids = np.flatnonzero(is_red_blue)
+    red_blue_ids = red_blue_ids[np.argsort(-group_sizes[red_blue_ids], kind='stable')]
 
-    for group in red_blue_groups:
+    for group in (groups[i] for i in red_blue_ids):
         target_color = group['primary_pod']
-        potential_teams = [name for name, stats in teams.items() 
-                          if stats['color'] == target_color and stats['size'] + group['size'] <= MAX_TEAM_SIZE]
-
-        if potential_teams:
-            best_team = min(potential_teams, key=lambda name: teams[name]['size'])
-            teams[best_team]['size'] += group['size']
-            teams[best_team]['groups'].append(group)
+        potential_teams = np.flatnonzero((team_color == target_color) & (team_size + group['size'] <= MAX_TEAM_SIZE))
+
+        if potential_teams.size:
+            best_team = potential_teams[team_size[potential_teams].argmin()]
+            team_size[best_team] += group['size']
+            team_red[best_team] += group['composition'][RED_POD]
+            team_green[best_team] += group['composition'][GREEN_POD]
+            team_pink[best_team] += group['composition'][PINK_POD]
             for key in group['keys']: 
-                assignments[key] = best_team
+                team_assignments[key] = best_team
         else:
             unassigned_groups.append(group)
 
     # --- Phase 3: Strategic Filler Distribution ---
-    filler_groups = unassigned_groups + [g for g in groups if g['primary_pod'] not in ['Red', 'Blue']]
+    filler_groups = unassigned_groups + [groups[i] for i in np.flatnonzero(~is_red_blue)]
 
-    # Update team stats after initial placement
-    for name, stats in teams.items():
-        stats['red_count'] = sum(g['composition'].get('Red', 0) for g in stats['groups'])
-        stats['green_count'] = sum(g['composition'].get('Green', 0) for g in stats['groups'])
-        stats['pink_count'] = sum(g['composition'].get('Pink', 0) for g in stats['groups'])
+    # One sort orders the fillers for every stage: green groups first, then the rest, largest first
+    filler_groups.sort(key=lambda x: (not x['has_green'], -x['size']))
+    num_green_groups = sum(g['has_green'] for g in filler_groups)
 
     # Stage 3A: Targeted Green Distribution
-    green_groups = sorted([g for g in filler_groups if g['has_green']], key=lambda x: -x['size'])
     relaxation_pool = []
 
-    for group in green_groups:
-        group_green_count = group['composition'].get('Green', 0)
-        potential_teams = []
-        for name, stats in teams.items():
-            # Hard Constraint Check
-            if (stats['size'] + group['size'] <= MAX_TEAM_SIZE) and \
-               (stats['green_count'] + group_green_count <= 4):
-                potential_teams.append(name)
+    for group in islice(filler_groups, num_green_groups):
+        group_green_count = group['composition'][GREEN_POD]
+        # Hard Constraint Check
+        potential_teams = np.flatnonzero((team_size + group['size'] <= MAX_TEAM_SIZE) &
+                                         (team_green + group_green_count <= 4))
 
-        if potential_teams:
+        if potential_teams.size:
             # Preference Ranking
-            best_team = sorted(potential_teams, key=lambda name: (-teams[name]['red_count'], teams[name]['size']))[0]
+            best_team = potential_teams[np.lexsort((team_size[potential_teams], -team_red[potential_teams]))[0]]
             # Assign and update
-            teams[best_team]['size'] += group['size']
-            teams[best_team]['green_count'] += group_green_count
-            teams[best_team]['red_count'] += group['composition'].get('Red', 0)
+            team_size[best_team] += group['size']
+            team_green[best_team] += group_green_count
+            team_red[best_team] += group['composition'][RED_POD]
             for key in group['keys']: 
-                assignments[key] = best_team
+                team_assignments[key] = best_team
         else:
             relaxation_pool.append(group)
 
-    # Stage 3B: Constraint Relaxation
-    for group in sorted(relaxation_pool, key=lambda x: -x['size']):
-        group_green_count = group['composition'].get('Green', 0)
-        potential_teams = [name for name, stats in teams.items() 
-                          if stats['size'] + group['size'] <= MAX_TEAM_SIZE]
+    # Stage 3B: Constraint Relaxation (the pool is already largest first)
+    relaxed_groups = []
+    for group in relaxation_pool:
+        group_green_count = group['composition'][GREEN_POD]
+        potential_teams = np.flatnonzero(team_size + group['size'] <= MAX_TEAM_SIZE)
 
-        if potential_teams:
+        if potential_teams.size:
             # Minimization Ranking
-            best_team = sorted(potential_teams, key=lambda name: (teams[name]['green_count'], -teams[name]['red_count'], teams[name]['size']))[0]
-            teams[best_team]['size'] += group['size']
-            teams[best_team]['green_count'] += group_green_count
-            teams[best_team]['red_count'] += group['composition'].get('Red', 0)
+            best_team = potential_teams[np.lexsort((team_size[potential_teams], -team_red[potential_teams],
+                                                    team_green[potential_teams]))[0]]
+            team_size[best_team] += group['size']
+            team_green[best_team] += group_green_count
+            team_red[best_team] += group['composition'][RED_POD]
             for key in group['keys']: 
-                assignments[key] = best_team
-            logging.warning(f"Tenure constraint violated. Assigned group {group['keys']} to {best_team}, which now has {teams[best_team]['green_count']} green players.")
+                team_assignments[key] = best_team
+            relaxed_groups.append((group['keys'], best_team, team_green[best_team]))
         else:
             logging.error(f"Could not place group {group['keys']} even after relaxing constraints.")
 
-    # Stage 3C: Remaining Filler Distribution
-    remaining_fillers = [g for g in filler_groups if not g['has_green'] and all(k not in assignments for k in g['keys'])]
-    for group in sorted(remaining_fillers, key=lambda x: -x['size']):
-        potential_teams = [name for name, stats in teams.items() 
-                         if stats['size'] + group['size'] <= MAX_TEAM_SIZE]
-        if potential_teams:
+    # One summary record per request rather than one per relaxed group
+    if relaxed_groups and logging.getLogger().isEnabledFor(logging.WARNING):
+        details = '; '.join(f"{keys} -> {team_names[team_id]} ({green_count} green)"
+                            for keys, team_id, green_count in relaxed_groups)
+        logging.warning(f"Tenure constraint violated for {len(relaxed_groups)} group(s): {details}")
+
+    # Stage 3C: Remaining Filler Distribution (none of these groups has been placed yet)
+    for group in islice(filler_groups, num_green_groups, None):
+        potential_teams = np.flatnonzero(team_size + group['size'] <= MAX_TEAM_SIZE)
+        if potential_teams.size:
             # Preference Ranking
-            best_team = sorted(potential_teams, key=lambda name: (teams[name]['pink_count'], teams[name]['size'], teams[name]['color'] != 'Red'))[0]
-            teams[best_team]['size'] += group['size']
-            teams[best_team]['pink_count'] += group['composition'].get('Pink', 0)
+            best_team = potential_teams[np.lexsort((team_color[potential_teams] != RED_POD, team_size[potential_teams],
+                                                    team_pink[potential_teams]))[0]]
+            team_size[best_team] += group['size']
+            team_pink[best_team] += group['composition'][PINK_POD]
             for key in group['keys']: 
-                assignments[key] = best_team
+                team_assignments[key] = best_team
         else:
             logging.error(f"Could not place remaining filler group {group['keys']}.")
 
-    return assignments
+    return {key: team_names[team_id] for key, team_id in team_assignments.items()}
 
 
 @functions_framework.http
@@ -261,49 +432,57 @@ def team_allocation(request: Request):
         
         logging.info(f'Processing {len(players)} players')
         
-        # Convert to DataFrame
-        df_original = pd.DataFrame(players)
-        
-        # Preprocess data
-        df_all_players, df_available = preprocess_data(df_original.copy())
+        # Preprocess data; small rosters skip pandas entirely
+        small_roster = len(players) < SMALL_ROSTER_SIZE
+        if small_roster:
+            all_players, available_players = preprocess_records(players)
+            roster = [(p['key'], p['available'], p['pod'], p['tier']) for p in all_players]
+        else:
+            df_all_players, available_players = preprocess_data(pd.DataFrame(players))
+            roster = list(zip(df_all_players['key'], df_all_players['available'],
+                              df_all_players['pod'], df_all_players['tier']))
         
-        if df_available.empty:
+        if len(available_players) == 0:
             return {
                 'success': False,
                 'error': 'No available players to sort',
                 'data': []
             }, 200
         
-        logging.info(f'Processing {len(df_available)} available players')
+        logging.info(f'Processing {len(available_players)} available players')
         
         # Phase 0: Create Groups
-        allocation_groups = create_allocation_groups(df_available)
+        if small_roster:
+            allocation_groups = create_allocation_groups_from_records(available_players)
+        else:
+            allocation_groups = create_allocation_groups(available_players)
         
         # Allocate teams
-        assignments = allocate_teams_stratified(allocation_groups, df_available)
+        assignments = allocate_teams_stratified(allocation_groups)
         
         # Prepare response
         results = []
-        for _, row in df_all_players.iterrows():
-            player_key = row['key']
+        for player_key, available, pod, tier in roster:
             assignment = assignments.get(player_key, 'Not Assigned')
             results.append({
                 'key': player_key,
                 'team': assignment,
-                'available': int(row['available']),
-                'pod': str(row['pod']),
-                'tier': int(row['tier'])
+                'available': int(available),
+                'pod': str(pod),
+                'tier': int(tier)
             })
         
-        return {
+        payload = {
             'success': True,
             'data': {
                 'allocations': results,
-                'total_players': len(df_all_players),
-                'available_players': len(df_available),
+                'total_players': len(roster),
+                'available_players': len(available_players),
                 'assigned_players': len([r for r in results if r['team'] != 'Not Assigned'])
             }
-        }, 200
+        }
+        # The allocation list grows with the roster, so serialize it with orjson rather than Flask's json
+        return Response(orjson.dumps(payload), status=200, mimetype='application/json')
         
     except Exception as e:
         logging.error(f'Error processing team allocation: {str(e)}', exc_info=True)
@@ -0,0 +1,188 @@
+"""Tests for the team allocation in main.py.
+
+Rosters below SMALL_ROSTER_SIZE never touch pandas, so the parity tests run the same payloads
+through both backends and require identical results. The golden tests pin the team of every
+player on fixed rosters to what the original pandas allocator produced.
+"""
+
+import json
+import random
+
+import pandas as pd
+import pytest
+
+import main
+
+
+PAYLOADS = [
+    # pandas infers float64 for numeric columns with a gap: 102 in pairedwith becomes '102.0'
+    [{'key': 101, 'pairedwith': 102, 'pod': 'Red', 'available': 1},
+     {'key': 102, 'pod': 'Blue', 'available': 1}],
+    [{'key': 101, 'pod': 'Red', 'available': 1}, {'key': None, 'pod': 'Blue', 'available': 1}],
+    [{'key': 1, 'available': True, 'pod': 'Green'}, {'key': 2.5, 'available': 'abc', 'pod': 'Green'},
+     {'key': 'c', 'available': 1, 'pairedwith': 'C'}],
+    [{'Key ': ' A', 'Available': ' 1 ', 'IsTentpole': 'true', 'Pod': 'Red', 'Tier': '3'},
+     {'Key ': 'B', 'Available': '1.7', 'Pod': ' Blue', 'Tier': 1.5, 'Paired With': 'a'}],
+    [{'key': 'x', 'available': 1, 'istentpole': True, 'pod': 3}, {'key': 'y', 'available': 1, 'istentpole': None, 'coach': 5}],
+    [{'key': 'x', 'available': 1, 'tier': 2}, {'key': 'y', 'available': 0, 'tier': None}, {'key': '', 'available': 1}],
+    # pd.to_numeric rejects digit separators and non-ASCII digits that float() accepts
+    [{'key': 'x', 'available': '1_0', 'tier': '1_0'}, {'key': 'y', 'available': '１', 'tier': '٣'}],
+    # An int beyond int64/uint64 before any None keeps the column object, so key 0 stays '0'
+    [{'key': 10**20, 'available': 1, 'pod': 'Red'}, {'key': 0, 'available': 1, 'pod': 'Blue'}, {'key': None, 'available': 1}],
+    [{'key': None, 'available': 1}, {'key': 10**20, 'available': 1}, {'key': 2**63, 'available': 1, 'pairedwith': -1}],
+]
+
+
+def random_payload(rng, size):
+    names = [f"P{i}" for i in range(size)]
+    players = []
+    for name in names:
+        player = {
+            'key': rng.choice([name] * 20 + ['', None, ' ' + name]),
+            'available': rng.choice([1, 1, 1, 0, '1', None]),
+            'istentpole': rng.choice([True, False, 'TRUE', ' true ', None]),
+            'pairedwith': rng.choice([''] * 4 + [rng.choice(names).lower(), rng.choice(names), None]),
+            'tier': rng.choice([1, 2, 3, None]),
+            'coach': rng.choice(['', 'Coach A', 'Coach B', None]),
+            'pod': rng.choice(['Red', 'Blue', 'Green', 'Pink', ' Red ', 'Unknown', 'Black', None]),
+        }
+        if rng.random() < 0.05:
+            del player['coach']
+        players.append(player)
+    return players
+
+
+PAYLOADS += [random_payload(random.Random(seed), size) for seed, size in enumerate([3, 10, 25, 60, 120])]
+
+
+def player(key, pod, pairedwith='', available=1):
+    return {'key': key, 'available': available, 'istentpole': False, 'pairedwith': pairedwith,
+            'tier': 2, 'coach': '', 'pod': pod}
+
+
+# Expected teams were produced by running each roster through the allocator as it was before
+# the pod codes, union-find grouping and small-roster path were introduced.
+GOLDEN_CASES = {
+    'documented_pods_with_pairings': (
+        [player(f'R{i}', 'Red', f'R{i + 1}' if i % 3 == 0 else '') for i in range(10)]
+        + [player(f'B{i}', 'Blue', 'G0' if i == 0 else '') for i in range(9)]
+        + [player(f'G{i}', 'Green') for i in range(5)]
+        + [player(f'P{i}', 'Pink', 'P1' if i == 0 else '') for i in range(4)]
+        + [player('N0', 'Red', available=0)],
+        {'Blue Team 1': 'B0 B3 B5 B7 G0 P0 P1',
+         'Blue Team 2': 'B1 B2 B4 B6 B8 P2',
+         'Red Team 1': 'R0 R1 R6 R7 R8 G1 G3 P3',
+         'Red Team 2': 'R2 R3 R4 R5 R9 G2 G4',
+         'Not Assigned': 'N0'},
+    ),
+    # Pod labels straight from the sheet: 'red' and 'Unknown' are not documented pods
+    'sheet_labels_red_lowercase_and_blank': (
+        [player('a', 'Blue', 'b'), player('b', 'red', 'c'), player('c', 'Unknown')]
+        + [player(f'R{i}', 'Red') for i in range(3)]
+        + [player(f'B{i}', 'Blue') for i in range(7)],
+        {'Blue Team 1': 'a b c B0 B1 B2 B3 B4 B5',
+         'Red Team 1': 'R0 R1 R2 B6'},
+    ),
+    'unrecognised_label_sorting_before_red': (
+        [player(f'R{i}', 'Red') for i in range(8)] + [player('X0', 'Red', 'X1'), player('X1', 'Black')],
+        {'Red Team 1': 'R0 R2 R4 R6 X0 X1',
+         'Red Team 2': 'R1 R3 R5 R7'},
+    ),
+    'mixed_unrecognised_labels': (
+        [player(f'R{i}', 'Red') for i in range(6)] + [player(f'B{i}', 'Blue') for i in range(5)]
+        + [player('Y0', 'Yellow', 'Y1'), player('Y1', 'Red', 'Y2'), player('Y2', 'Unknown')]
+        + [player('Z0', 'Amber', 'Z1'), player('Z1', 'Blue')]
+        + [player('U0', 'Unknown', 'U1'), player('U1', 'Red')]
+        + [player('G0', 'Green', 'G1'), player('G1', 'Yellow')],
+        {'Blue Team 1': 'B0 B1 B2 B3 B4 Z0 Z1 G0 G1',
+         'Red Team 1': 'R0 R1 R2 R3 Y0 Y1 Y2 U0 U1',
+         'Not Assigned': 'R4 R5'},
+    ),
+    # Stage 3A: equal red counts, so greens alternate between teams by size
+    'stage_3a_ties': (
+        [player(f'R{i}', 'Red') for i in range(12)] + [player(f'G{i}', 'Green') for i in range(6)],
+        {'Red Team 1': 'R0 R2 R4 R6 R8 R10 G0 G2 G4',
+         'Red Team 2': 'R1 R3 R5 R7 R9 R11 G1 G3 G5'},
+    ),
+    # Stage 3B: both teams reach the green limit and the last greens are placed by relaxation
+    'stage_3b_relaxation': (
+        [player(f'R{i}', 'Red') for i in range(3)] + [player(f'B{i}', 'Blue') for i in range(2)]
+        + [player(f'G{i}', 'Green') for i in range(10)],
+        {'Blue Team 1': 'B0 B1 G4 G5 G6 G7 G9',
+         'Red Team 1': 'R0 R1 R2 G0 G1 G2 G3 G8'},
+    ),
+    # Stage 3C: pinks and unknowns tie on size and pink count between a Red and a Blue team
+    'stage_3c_ties': (
+        [player(f'R{i}', 'Red') for i in range(5)] + [player(f'B{i}', 'Blue') for i in range(5)]
+        + [player(f'P{i}', 'Pink') for i in range(5)] + [player(f'Q{i}', 'Unknown') for i in range(4)]
+        + [player('PP0', 'Pink', 'PP1'), player('PP1', 'Unknown')],
+        {'Blue Team 1': 'B0 B1 B2 B3 B4 P0 P1 P3 Q0',
+         'Red Team 1': 'R0 R1 R2 R3 R4 P2 P4 PP0 PP1',
+         'Not Assigned': 'Q1 Q2 Q3'},
+    ),
+}
+
+
+class FakeRequest:
+    method = 'POST'
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def get_json(self):
+        return self.payload
+
+
+def _copy(players):
+    return [dict(player) for player in players]
+
+
+@pytest.mark.parametrize('players', PAYLOADS)
+def test_preprocessors_agree(players):
+    df_all_players, df_available = main.preprocess_data(pd.DataFrame(_copy(players)))
+    all_players, available_players = main.preprocess_records(_copy(players))
+
+    roster = list(zip(df_all_players['key'], df_all_players['available'], df_all_players['pod'], df_all_players['tier']))
+    assert [(str(k), int(a), str(p), int(t)) for k, a, p, t in roster] == \
+           [(p['key'], p['available'], str(p['pod']), int(p['tier'])) for p in all_players]
+    assert df_available.to_dict('records') == available_players
+
+
+@pytest.mark.parametrize('players', PAYLOADS)
+def test_groups_agree(players):
+    _, df_available = main.preprocess_data(pd.DataFrame(_copy(players)))
+    _, available_players = main.preprocess_records(_copy(players))
+    if not available_players:
+        return
+
+    def summary(groups):
+        return [(g['keys'], g['size'], g['is_tentpole_group'], list(g['composition']), int(g['primary_pod']))
+                for g in groups]
+
+    assert summary(main.create_allocation_groups(df_available)) == \
+           summary(main.create_allocation_groups_from_records(available_players))
+
+
+@pytest.mark.parametrize('players', PAYLOADS)
+def test_handler_output_does_not_depend_on_roster_size(players, monkeypatch):
+    def run():
+        response = main.team_allocation(FakeRequest({'players': _copy(players)}))
+        if isinstance(response, tuple):
+            return response
+        return json.loads(response.get_data()), response.status_code
+
+    small = run()
+    monkeypatch.setattr(main, 'SMALL_ROSTER_SIZE', 0)
+    assert run() == small
+
+
+@pytest.mark.parametrize('small_roster', [True, False])
+@pytest.mark.parametrize('players, expected', GOLDEN_CASES.values(), ids=GOLDEN_CASES.keys())
+def test_allocation_matches_original_allocator(players, expected, small_roster, monkeypatch):
+    if not small_roster:
+        monkeypatch.setattr(main, 'SMALL_ROSTER_SIZE', 0)
+    response = main.team_allocation(FakeRequest({'players': _copy(players)}))
+
+    allocations = json.loads(response.get_data())['data']['allocations']
+    assert {a['key']: a['team'] for a in allocations} == \
+           {key: team for team, keys in expected.items() for key in keys.split()}